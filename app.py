@@ -1,12 +1,22 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, lambda_stmt, or_, select
+from sqlalchemy.ext.hybrid import hybrid_property
 from datetime import datetime
+from functools import lru_cache
+import hashlib
+import itertools
+import json
+import orjson
 import os
 import random
+import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from cachetools import TTLCache
 from dotenv import load_dotenv
 import google.generativeai as genai
-from apscheduler.schedulers.background import BackgroundScheduler
 
 # Load environment variables
 load_dotenv()
@@ -14,12 +24,85 @@ load_dotenv()
 app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///selfcare.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Each gevent worker serves many requests at once, but they only hold a
+# connection for the duration of a query; allow bursts beyond the base pool
+# and fail fast instead of waiting the default 30 s for a free connection
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_size': 10,
+    'max_overflow': 40,
+    'pool_timeout': 5,
+    'pool_pre_ping': True
+}
 db = SQLAlchemy(app)
 
 # Configure Gemini AI
+# The REST transport goes through `requests`, which the gevent workers
+# (see gunicorn.conf.py) patch to be non-blocking while waiting on Gemini.
+# A single model is shared by all requests; it is None without an API key.
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-pro')
+if GEMINI_API_KEY:
+    genai.configure(api_key=GEMINI_API_KEY, transport='rest')
+    model = genai.GenerativeModel('gemini-pro')
+else:
+    model = None
+
+# Gemini calls run on a bounded pool with one slot per worker, so a burst
+# of requests is turned away with a 503 instead of queueing behind slow calls.
+# Matches the default per-host connection pool of requests/urllib3 (10), so
+# every in-flight call can reuse a kept-alive connection.
+GEMINI_MAX_WORKERS = 10
+_gemini_executor = ThreadPoolExecutor(max_workers=GEMINI_MAX_WORKERS)
+_gemini_slots = threading.BoundedSemaphore(GEMINI_MAX_WORKERS)
+
+class GeminiBusyError(Exception):
+    pass
+
+def generate_content(prompt, timeout):
+    if not _gemini_slots.acquire(blocking=False):
+        raise GeminiBusyError('Too many Gemini requests in flight')
+    try:
+        # The pinned SDK rejects a timeout kwarg; future.result enforces the deadline
+        future = _gemini_executor.submit(model.generate_content, prompt)
+    except Exception:
+        _gemini_slots.release()
+        raise
+    # The slot is held until the call really finishes, even after a timeout
+    future.add_done_callback(lambda _: _gemini_slots.release())
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        raise TimeoutError(f'Gemini did not respond within {timeout}s')
+
+# Exponential backoff with jitter so clients that failed together don't
+# retry in lockstep. Under the gevent workers time.sleep yields to other
+# requests instead of holding up the worker.
+def retry_backoff(attempt):
+    time.sleep(random.uniform(0.5, 1.5) * (2 ** attempt))
+
+# Time-of-day and meal context, indexed by hour (0-23)
+_TOD_BY_HOUR = ('evening',) * 5 + ('morning',) * 7 + ('afternoon',) * 5 + ('evening',) * 7
+_MEAL_BY_HOUR = (('light evening snack',) * 5 + ('breakfast',) * 5 + ('mid-morning snack',) * 2 +
+                 ('lunch',) * 2 + ('afternoon snack',) * 3 + ('dinner',) * 4 + ('light evening snack',) * 3)
+
+# Same output as strftime('%I:%M %p') without the per-call locale lookup
+def format_clock_time(dt):
+    return f"{dt.hour % 12 or 12:02d}:{dt.minute:02d} {'AM' if dt.hour < 12 else 'PM'}"
+
+# Cache Gemini replies for repeated prompts (10 minutes)
+_gemini_cache = TTLCache(maxsize=1024, ttl=600)
+_gemini_cache_lock = threading.Lock()
+
+def _prompt_key(prompt):
+    return hashlib.blake2b(prompt.encode(), digest_size=16).digest()
+
+def get_cached_reply(prompt):
+    with _gemini_cache_lock:
+        return _gemini_cache.get(_prompt_key(prompt))
+
+def cache_reply(prompt, reply):
+    with _gemini_cache_lock:
+        _gemini_cache[_prompt_key(prompt)] = reply
 
 # Database Models
 class User(db.Model):
@@ -33,82 +116,239 @@ class Reminder(db.Model):
     completed = db.Column(db.Boolean, default=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_reminder_user_completed_time', 'user_id', 'completed', 'scheduled_time'),
+    )
+
+    # A reminder counts as completed once its scheduled time has passed,
+    # so overdue status is computed at read time instead of written back
+    @hybrid_property
+    def effective_completed(self):
+        return self.completed or self.scheduled_time < datetime.now()
+
+    @effective_completed.expression
+    def effective_completed(cls):
+        # Compare against a bound local time; SQLite's CURRENT_TIMESTAMP is UTC
+        return or_(cls.completed, cls.scheduled_time < datetime.now())
+
+def set_sqlite_pragmas(dbapi_conn, _connection_record):
+    # WAL lets readers and reminder writes proceed without blocking each other
+    cursor = dbapi_conn.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
 # Create database tables
 with app.app_context():
+    event.listen(db.engine, 'connect', set_sqlite_pragmas)
     db.create_all()
+    # create_all() skips tables that already exist, so add new indexes to an existing database
+    for index in Reminder.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+
+def get_active_reminders(current_time):
+    # lambda_stmt caches the compiled SELECT across calls; current_time is a
+    # closure variable, so it is tracked as a bound parameter on every call
+    stmt = lambda_stmt(lambda: select(Reminder).where(
+        Reminder.user_id == 1,
+        Reminder.completed == False,
+        Reminder.scheduled_time > current_time
+    ))
+    reminders = db.session.scalars(stmt).all()
+    # Give the connection back before the caller waits on Gemini; the loaded
+    # reminders stay readable after the session is closed
+    db.session.close()
+    return reminders
+
+# Prompt templates, built once and filled in per request
+_SUGGESTION_PROMPT_TMPL = """Current time: {current_time}
+User's upcoming activities:
+{activities}
+
+Based on their schedule and the current time ({time_of_day}), suggest a unique and refreshing 5-10 minute self-care activity that:
+1. Doesn't conflict with their schedule
+2. Helps them stay energized and focused
+3. Is specific and actionable
+4. Different from standard suggestions like 'take a breathing break'"""
+
+_DIET_PROMPT_TMPL = """You are a knowledgeable nutrition advisor. The current time is {current_time} which is typically {meal_context} time. The user is asking about {query_topic}. Provide specific, practical advice tailored to this timing.
+
+            If the query is about diet:
+            1. Start with appropriate {meal_context} suggestions
+            2. Then provide a structured meal plan for the rest of the day:
+               - Include specific meal timings
+               - Suggest portion sizes using common household measurements
+               - Include at least 2 alternatives for each meal
+               - Balance proteins, carbs, and healthy fats
+               - Specify water intake recommendations
+
+            If the query is about food:
+            1. Focus on immediate {meal_context} recommendations:
+               - 3-4 specific healthy options suitable for {meal_context}
+               - Exact portion sizes using common measurements
+               - Quick preparation methods
+               - Nutritional benefits of each option
+               - Healthy alternatives for common dietary restrictions
+
+            Response Format:
+            1. Personalized greeting mentioning the current meal timing
+            2. Specific recommendations with exact portions and timing
+            3. 2-3 practical preparation or planning tips
+            4. A reminder about mindful eating and portion control
+            5. Brief note about consulting healthcare providers for personalized diet plans
+
+            Important Guidelines:
+            - All suggestions should be practical and easy to implement
+            - Include both vegetarian and non-vegetarian options
+            - Suggest common ingredients found in most kitchens
+            - Include quick preparation tips for busy schedules
+            - Emphasize balanced nutrition and portion control
+            - Consider common dietary restrictions and allergies
+            """
+
+_CHAT_PROMPT_TMPL = """You are a knowledgeable and empathetic healthcare assistant focused on providing personalized, practical self-care advice. Analyze the user's message carefully and respond with relevant, actionable guidance.
+
+            Core Response Guidelines:
+            1. Start with a brief, empathetic acknowledgment of the user's concern
+            2. Provide specific, practical advice that can be implemented immediately
+            3. Focus on holistic well-being (physical, mental, and emotional aspects)
+            4. Keep responses clear, concise, and directly related to the user's query
+
+            Key Health Areas & Responses:
+            - Sleep Issues: Sleep hygiene tips, relaxation techniques, bedtime routines
+            - Pain Management: Safe relief methods, posture tips, ergonomic advice
+            - Exercise: Simple home exercises, stretching routines, activity modifications
+            - Stress: Quick grounding techniques, breathing exercises, mindfulness practices
+            - Anxiety: Immediate coping strategies, thought reframing, calming activities
+            - Focus: Concentration techniques, break scheduling, environment optimization
+            - Mood: Mood-lifting activities, social connection tips, routine building
+
+        Previous context: {context}
+        User message: {message}
+
+        Response Format:
+        1. Brief empathetic acknowledgment (1 sentence)
+        2. 2-3 immediate, practical suggestions specific to their concern
+        3. 1-2 preventive measures or long-term strategies
+        4. If relevant, mention specific warning signs that require professional attention
+        5. End with: 'Remember: This advice is for informational purposes only. For persistent or concerning symptoms, please consult a healthcare provider.'
+
+        Important:
+        - Keep responses focused and relevant to the specific query
+        - Provide actionable steps rather than general advice
+        - Maintain a supportive, non-judgmental tone
+        - Emphasize the importance of professional medical advice when needed
+
+Keep responses practical, specific, and focused on actionable self-care steps while maintaining appropriate medical boundaries."""
+
+# Prompt builders. Only those with a small keyspace are memoized; prompts
+# keyed on free-text messages or reminder lists would rarely hit and would
+# keep users' messages in memory.
+@lru_cache(maxsize=8)
+def build_idle_suggestion_prompts(time_of_day):
+    return (
+        f"Suggest a quick self-care activity perfect for this {time_of_day} that takes 5-10 minutes.",
+        "Recommend a simple mindfulness or wellness activity that can boost energy and mood.",
+        "What's a creative way to take a short mental health break right now?"
+    )
+
+def build_suggestion_prompt(current_time, time_of_day, activities):
+    return _SUGGESTION_PROMPT_TMPL.format_map({
+        'current_time': current_time,
+        'activities': activities,
+        'time_of_day': time_of_day
+    })
+
+@lru_cache(maxsize=256)
+def build_diet_prompt(current_time, meal_context, is_diet_query):
+    return _DIET_PROMPT_TMPL.format_map({
+        'current_time': current_time,
+        'meal_context': meal_context,
+        'query_topic': 'a diet plan' if is_diet_query else 'food recommendations'
+    })
+
+def build_chat_prompt(context, message):
+    return _CHAT_PROMPT_TMPL.format_map({'context': context, 'message': message})
+
+# Fallbacks are served from a pre-shuffled cycle, which varies replies
+# without drawing a random number on every failure
+_fallback_lock = threading.Lock()
+
+def shuffled_cycle(options):
+    return itertools.cycle(random.sample(options, len(options)))
+
+def next_fallback(fallback_cycle):
+    with _fallback_lock:
+        return next(fallback_cycle)
+
+SUGGESTION_FALLBACKS = [
+    "Do a quick desk stretch routine focusing on your neck and shoulders.",
+    "Take a short walk around your space while practicing mindful observation.",
+    "Do a quick gratitude exercise: write down three things you're thankful for.",
+    "Practice the 4-7-8 breathing technique for one minute.",
+    "Stand up and do 10 gentle jumping jacks to boost circulation."
+]
+_suggestion_fallbacks = shuffled_cycle(SUGGESTION_FALLBACKS)
+
+ERROR_FALLBACKS = [
+    "Take a moment to stretch and reset.",
+    "Step outside for a breath of fresh air.",
+    "Do a quick body scan meditation.",
+    "Stand up and shake out any tension.",
+    "Take a short break to hydrate and relax."
+]
+_error_fallbacks = shuffled_cycle(ERROR_FALLBACKS)
 
 # AI Functions
 def get_self_care_suggestion():
-    if not GEMINI_API_KEY:
+    if model is None:
         print('Error: Gemini API key not configured')
         return None
 
     try:
-        # Initialize Gemini model for this request
-        genai.configure(api_key=GEMINI_API_KEY)
-        model = genai.GenerativeModel('gemini-pro')
-        
         # Get user's reminders to provide context to Gemini
-        reminders = Reminder.query.filter_by(user_id=1).all()
         current_time = datetime.now()
-        active_reminders = [r for r in reminders if not r.completed and r.scheduled_time > current_time]
+        active_reminders = get_active_reminders(current_time)
         
         # Generate a more dynamic prompt based on context
-        time_of_day = 'morning' if 5 <= current_time.hour < 12 else 'afternoon' if 12 <= current_time.hour < 17 else 'evening'
+        time_of_day = _TOD_BY_HOUR[current_time.hour]
         
         if not active_reminders:
-            prompts = [
-                f"Suggest a quick self-care activity perfect for this {time_of_day} that takes 5-10 minutes.",
-                "Recommend a simple mindfulness or wellness activity that can boost energy and mood.",
-                "What's a creative way to take a short mental health break right now?"
-            ]
-            prompt = random.choice(prompts)
+            prompt = random.choice(build_idle_suggestion_prompts(time_of_day))
         else:
-            activities = '\n'.join([f"- {r.activity} scheduled for {r.scheduled_time.strftime('%I:%M %p')}" for r in active_reminders])
-            prompt = f"""Current time: {current_time.strftime('%I:%M %p')}
-User's upcoming activities:
-{activities}
+            activities = '\n'.join([f"- {r.activity} scheduled for {format_clock_time(r.scheduled_time)}" for r in active_reminders])
+            prompt = build_suggestion_prompt(format_clock_time(current_time), time_of_day, activities)
 
-Based on their schedule and the current time ({time_of_day}), suggest a unique and refreshing 5-10 minute self-care activity that:
-1. Doesn't conflict with their schedule
-2. Helps them stay energized and focused
-3. Is specific and actionable
-4. Different from standard suggestions like 'take a breathing break'"""
+        cached = get_cached_reply(prompt)
+        if cached:
+            return cached
 
         # Add safety timeout and retry logic
         max_retries = 2
         for attempt in range(max_retries):
             try:
-                response = model.generate_content(prompt, timeout=10)
+                response = generate_content(prompt, timeout=10)
                 if response and hasattr(response, 'parts') and response.parts:
                     suggestion = response.parts[0].text.strip()
                     if suggestion and len(suggestion) > 10:  # Ensure we got a meaningful response
+                        cache_reply(prompt, suggestion)
                         return suggestion
+            except GeminiBusyError:
+                raise
             except Exception as retry_error:
                 print(f'Attempt {attempt + 1} failed: {str(retry_error)}')
                 if attempt < max_retries - 1:
-                    time.sleep(1)  # Brief pause before retry
+                    retry_backoff(attempt)
                 continue
 
-        # If all retries failed or no valid response, return a random fallback suggestion
-        fallback_suggestions = [
-            "Do a quick desk stretch routine focusing on your neck and shoulders.",
-            "Take a short walk around your space while practicing mindful observation.",
-            "Do a quick gratitude exercise: write down three things you're thankful for.",
-            "Practice the 4-7-8 breathing technique for one minute.",
-            "Stand up and do 10 gentle jumping jacks to boost circulation."
-        ]
-        return random.choice(fallback_suggestions)
+        # If all retries failed or no valid response, return a fallback suggestion
+        return next_fallback(_suggestion_fallbacks)
 
+    except GeminiBusyError:
+        raise
     except Exception as e:
         print(f'Error in get_self_care_suggestion: {str(e)}')
-        return random.choice([
-            "Take a moment to stretch and reset.",
-            "Step outside for a breath of fresh air.",
-            "Do a quick body scan meditation.",
-            "Stand up and shake out any tension.",
-            "Take a short break to hydrate and relax."
-        ])
+        return next_fallback(_error_fallbacks)
 
 # Routes
 @app.route('/')
@@ -117,7 +357,7 @@ def home():
 
 @app.route('/api/suggestions')
 def get_suggestion():
-    if not GEMINI_API_KEY:
+    if model is None:
         return jsonify({'error': 'Gemini API key not configured'}), 500
     
     try:
@@ -125,6 +365,8 @@ def get_suggestion():
         if not suggestion:
             return jsonify({'error': 'No suggestion generated'}), 500
         return jsonify({'suggestion': suggestion})
+    except GeminiBusyError:
+        return jsonify({'error': 'Service busy, please try again shortly'}), 503
     except Exception as e:
         print(f'Error generating suggestion: {str(e)}')
         return jsonify({'error': 'Failed to generate suggestion. Please try again.'}), 500
@@ -133,50 +375,45 @@ def get_suggestion():
 def create_reminder():
     data = request.json
     try:
-        reminder = Reminder(
-            activity=data['activity'],
-            scheduled_time=datetime.fromisoformat(data['scheduled_time']),
-            user_id=1  # Default user for now
-        )
-        db.session.add(reminder)
+        # Accept a single reminder or a list of them, inserted in one statement
+        items = data if isinstance(data, list) else [data]
+        rows = [
+            {
+                'activity': item['activity'],
+                'scheduled_time': datetime.fromisoformat(item['scheduled_time']),
+                'completed': False,
+                'user_id': 1  # Default user for now
+            } for item in items
+        ]
+        if not rows:
+            return jsonify({'error': 'No reminders provided'}), 400
+        db.session.execute(Reminder.__table__.insert(), rows)
         db.session.commit()
+        if len(rows) > 1:
+            return jsonify({'message': f'{len(rows)} reminders created successfully'})
         return jsonify({'message': 'Reminder created successfully'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def update_reminder_status():
-    with app.app_context():
-        current_time = datetime.now()
-        reminders = Reminder.query.filter_by(completed=False).all()
-        for reminder in reminders:
-            if current_time > reminder.scheduled_time:
-                reminder.completed = True
-        db.session.commit()
-
-# Create scheduler for automatic status updates
-scheduler = BackgroundScheduler()
-scheduler.add_job(update_reminder_status, 'interval', minutes=1)
-scheduler.start()
-
 @app.route('/api/reminders', methods=['GET'])
 def get_reminders():
-    current_time = datetime.now()
-    reminders = Reminder.query.filter_by(user_id=1).all()
-    
-    # Update status of overdue reminders
-    for reminder in reminders:
-        if not reminder.completed and current_time > reminder.scheduled_time:
-            reminder.completed = True
-    db.session.commit()
-    
-    return jsonify([
+    # Select plain columns so rows come back as tuples, not ORM instances.
+    rows = db.session.execute(
+        select(Reminder.id, Reminder.activity, Reminder.scheduled_time,
+               Reminder.effective_completed.label('completed'))
+        .where(Reminder.user_id == 1)
+        .order_by(Reminder.id)  # Keep insertion order; the composite index would reorder rows
+    ).all()
+
+    # orjson serializes the datetimes natively; they stay naive local times
+    return Response(orjson.dumps([
         {
             'id': r.id,
             'activity': r.activity,
-            'scheduled_time': r.scheduled_time.isoformat(),
-            'completed': r.completed
-        } for r in reminders
-    ])
+            'scheduled_time': r.scheduled_time,
+            'completed': bool(r.completed)
+        } for r in rows
+    ]), mimetype='application/json')
 
 @app.route('/api/reminders/<int:reminder_id>', methods=['DELETE'])
 def delete_reminder(reminder_id):
@@ -188,9 +425,56 @@ def delete_reminder(reminder_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Chat intents that get a dedicated prompt; matches word starts like "diets" or "foods"
+_INTENT_RE = re.compile(r'\b(diet|food)', re.IGNORECASE)
+
+# Diverse fallback responses for different scenarios
+CHAT_FALLBACK_RESPONSES = [
+    "I'd love to support you better. Could you share what specific aspect of self-care you're focusing on today?",
+    "Let's explore what would help you feel more balanced right now. What's on your mind?",
+    "I'm here to help you create a meaningful self-care routine. What area would you like to work on first?",
+    "Your well-being matters. Could you tell me more about what kind of support you're looking for?",
+    "Sometimes it helps to start with small steps. What's one self-care goal you'd like to focus on?",
+    "I'm interested in understanding your needs better. What brings you to seek self-care guidance today?"
+]
+_chat_fallbacks = shuffled_cycle(CHAT_FALLBACK_RESPONSES)
+
+def sse_event(payload, event=None):
+    prefix = f'event: {event}\n' if event else ''
+    return f'{prefix}data: {json.dumps(payload)}\n\n'
+
+# Yield the Gemini reply as Server-Sent Events while it is being generated
+def stream_chat_reply(prompt, cached=None):
+    if cached:
+        yield sse_event({'delta': cached})
+        yield sse_event({}, event='done')
+        return
+
+    parts = []
+    try:
+        response = model.generate_content(prompt, stream=True)
+        for chunk in response:
+            if chunk.parts:
+                parts.append(chunk.text)
+                yield sse_event({'delta': chunk.text})
+    except Exception as stream_error:
+        print(f'Chat stream failed: {str(stream_error)}')
+        if parts:
+            # Part of the reply was already sent; tell the client it is cut off
+            yield sse_event({'error': 'Reply was interrupted. Please try again.'}, event='error')
+            return
+
+    reply = ''.join(parts).strip()
+    if len(reply) >= 10:
+        # Only complete replies are cached
+        cache_reply(prompt, reply)
+    elif not parts:
+        yield sse_event({'delta': next_fallback(_chat_fallbacks)})
+    yield sse_event({}, event='done')
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
-    if not GEMINI_API_KEY:
+    if model is None:
         print('Error: Gemini API key not configured')
         return jsonify({'error': 'Service temporarily unavailable'}), 503
 
@@ -203,21 +487,13 @@ def chat():
         if not message:
             return jsonify({'error': 'Message cannot be empty'}), 400
 
-        # Initialize Gemini model for this request
-        try:
-            genai.configure(api_key=GEMINI_API_KEY)
-            model = genai.GenerativeModel('gemini-pro')
-        except Exception as config_error:
-            print(f'Error configuring Gemini API: {str(config_error)}')
-            return jsonify({'error': 'Service configuration error'}), 503
+        # Take one timestamp for the whole request
+        current_time = datetime.now()
+        current_hour = current_time.hour
 
         # Get user's current reminders for context
         try:
-            current_time = datetime.now()
-            active_reminders = Reminder.query.filter_by(
-                user_id=1,
-                completed=False
-            ).filter(Reminder.scheduled_time > current_time).all()
+            active_reminders = get_active_reminders(current_time)
         except Exception as db_error:
             print(f'Database error in chat endpoint: {str(db_error)}')
             active_reminders = []
@@ -226,7 +502,7 @@ def chat():
         context = ""
         if active_reminders:
             try:
-                activities = '\n'.join([f"- {r.activity} at {r.scheduled_time.strftime('%I:%M %p')}" 
+                activities = '\n'.join([f"- {r.activity} at {format_clock_time(r.scheduled_time)}"
                                        for r in active_reminders])
                 context = f"\n\nContext: User has these upcoming self-care activities:\n{activities}"
             except Exception as format_error:
@@ -234,96 +510,34 @@ def chat():
                 context = ""
 
         # Determine if the message is about diet or food
-        message_lower = message.lower()
-        is_diet_query = 'diet' in message_lower
-        is_food_query = 'food' in message_lower
-        current_hour = datetime.now().hour
-        current_time = datetime.now()
+        intents = {match.lower() for match in _INTENT_RE.findall(message)}
+        is_diet_query = 'diet' in intents
+        is_food_query = 'food' in intents
 
         if is_diet_query or is_food_query:
             # Determine meal context based on time
-            if 5 <= current_hour < 10:
-                meal_context = "breakfast"
-            elif 10 <= current_hour < 12:
-                meal_context = "mid-morning snack"
-            elif 12 <= current_hour < 14:
-                meal_context = "lunch"
-            elif 14 <= current_hour < 17:
-                meal_context = "afternoon snack"
-            elif 17 <= current_hour < 21:
-                meal_context = "dinner"
-            else:
-                meal_context = "light evening snack"
-
-            prompt = f"""You are a knowledgeable nutrition advisor. The current time is {current_time.strftime('%I:%M %p')} which is typically {meal_context} time. The user is asking about {'a diet plan' if is_diet_query else 'food recommendations'}. Provide specific, practical advice tailored to this timing.
-
-            If the query is about diet:
-            1. Start with appropriate {meal_context} suggestions
-            2. Then provide a structured meal plan for the rest of the day:
-               - Include specific meal timings
-               - Suggest portion sizes using common household measurements
-               - Include at least 2 alternatives for each meal
-               - Balance proteins, carbs, and healthy fats
-               - Specify water intake recommendations
-
-            If the query is about food:
-            1. Focus on immediate {meal_context} recommendations:
-               - 3-4 specific healthy options suitable for {meal_context}
-               - Exact portion sizes using common measurements
-               - Quick preparation methods
-               - Nutritional benefits of each option
-               - Healthy alternatives for common dietary restrictions
-
-            Response Format:
-            1. Personalized greeting mentioning the current meal timing
-            2. Specific recommendations with exact portions and timing
-            3. 2-3 practical preparation or planning tips
-            4. A reminder about mindful eating and portion control
-            5. Brief note about consulting healthcare providers for personalized diet plans
+            meal_context = _MEAL_BY_HOUR[current_hour]
 
-            Important Guidelines:
-            - All suggestions should be practical and easy to implement
-            - Include both vegetarian and non-vegetarian options
-            - Suggest common ingredients found in most kitchens
-            - Include quick preparation tips for busy schedules
-            - Emphasize balanced nutrition and portion control
-            - Consider common dietary restrictions and allergies
-            """
+            prompt = build_diet_prompt(format_clock_time(current_time), meal_context, is_diet_query)
         else:
-            prompt = f"""You are a knowledgeable and empathetic healthcare assistant focused on providing personalized, practical self-care advice. Analyze the user's message carefully and respond with relevant, actionable guidance.
-
-            Core Response Guidelines:
-            1. Start with a brief, empathetic acknowledgment of the user's concern
-            2. Provide specific, practical advice that can be implemented immediately
-            3. Focus on holistic well-being (physical, mental, and emotional aspects)
-            4. Keep responses clear, concise, and directly related to the user's query
-
-            Key Health Areas & Responses:
-            - Sleep Issues: Sleep hygiene tips, relaxation techniques, bedtime routines
-            - Pain Management: Safe relief methods, posture tips, ergonomic advice
-            - Exercise: Simple home exercises, stretching routines, activity modifications
-            - Stress: Quick grounding techniques, breathing exercises, mindfulness practices
-            - Anxiety: Immediate coping strategies, thought reframing, calming activities
-            - Focus: Concentration techniques, break scheduling, environment optimization
-            - Mood: Mood-lifting activities, social connection tips, routine building
-
-        Previous context: {context}
-        User message: {message}
-
-        Response Format:
-        1. Brief empathetic acknowledgment (1 sentence)
-        2. 2-3 immediate, practical suggestions specific to their concern
-        3. 1-2 preventive measures or long-term strategies
-        4. If relevant, mention specific warning signs that require professional attention
-        5. End with: 'Remember: This advice is for informational purposes only. For persistent or concerning symptoms, please consult a healthcare provider.'
-
-        Important:
-        - Keep responses focused and relevant to the specific query
-        - Provide actionable steps rather than general advice
-        - Maintain a supportive, non-judgmental tone
-        - Emphasize the importance of professional medical advice when needed
-
-Keep responses practical, specific, and focused on actionable self-care steps while maintaining appropriate medical boundaries."""
+            prompt = build_chat_prompt(context, message)
+
+        # Clients that ask for a stream get the reply as it is generated
+        if data.get('stream'):
+            cached = get_cached_reply(prompt)
+            if cached:
+                return Response(stream_chat_reply(prompt, cached), mimetype='text/event-stream')
+            if not _gemini_slots.acquire(blocking=False):
+                return jsonify({'error': 'Service busy, please try again shortly'}), 503
+            response = Response(stream_chat_reply(prompt), mimetype='text/event-stream')
+            # Released when the server closes the response, even if the
+            # client disconnects before the stream starts
+            response.call_on_close(_gemini_slots.release)
+            return response
+
+        cached = get_cached_reply(prompt)
+        if cached:
+            return jsonify({'reply': cached})
 
         # Add retry logic with improved error handling
         max_retries = 2
@@ -331,7 +545,7 @@ Keep responses practical, specific, and focused on actionable self-care steps wh
 
         for attempt in range(max_retries):
             try:
-                response = model.generate_content(prompt, timeout=15)
+                response = generate_content(prompt, timeout=15)
                 if not response:
                     raise ValueError('Empty response from Gemini API')
 
@@ -342,29 +556,23 @@ Keep responses practical, specific, and focused on actionable self-care steps wh
                 if not reply or len(reply) < 10:
                     raise ValueError('Response too short or empty')
 
+                cache_reply(prompt, reply)
                 return jsonify({'reply': reply})
 
+            except GeminiBusyError:
+                return jsonify({'error': 'Service busy, please try again shortly'}), 503
             except Exception as retry_error:
                 last_error = retry_error
                 print(f'Chat attempt {attempt + 1} failed: {str(retry_error)}')
                 if attempt < max_retries - 1:
-                    time.sleep(1)  # Brief pause before retry
+                    retry_backoff(attempt)
                 continue
 
         # Log the final error before falling back
         if last_error:
             print(f'All retry attempts failed. Final error: {str(last_error)}')
 
-        # Diverse fallback responses for different scenarios
-        fallback_responses = [
-            "I'd love to support you better. Could you share what specific aspect of self-care you're focusing on today?",
-            "Let's explore what would help you feel more balanced right now. What's on your mind?",
-            "I'm here to help you create a meaningful self-care routine. What area would you like to work on first?",
-            "Your well-being matters. Could you tell me more about what kind of support you're looking for?",
-            "Sometimes it helps to start with small steps. What's one self-care goal you'd like to focus on?",
-            "I'm interested in understanding your needs better. What brings you to seek self-care guidance today?"
-        ]
-        return jsonify({'reply': random.choice(fallback_responses)})
+        return jsonify({'reply': next_fallback(_chat_fallbacks)})
 
     except Exception as e:
         print(f'Unexpected error in chat endpoint: {str(e)}')
@@ -0,0 +1,11 @@
+# Production server settings: gunicorn app:app
+#
+# Request time is almost entirely spent waiting on Gemini, so each worker
+# runs gevent greenlets instead of a handful of threads. A worker accepts up
+# to worker_connections requests, but at most GEMINI_MAX_WORKERS (app.py) of
+# them wait on Gemini at once; the rest get a 503 instead of queueing.
+bind = '0.0.0.0:5001'
+workers = 4
+worker_class = 'gevent'
+worker_connections = 1000
+timeout = 60